@@ -6,6 +6,7 @@ dependency injection and easier testing.
 """
 
 from abc import ABC, abstractmethod
+from types import SimpleNamespace
 from typing import AsyncIterator, Optional, Dict, Any
 from claude_agent_sdk import ClaudeSDKClient, ClaudeAgentOptions
 
@@ -106,6 +107,8 @@ class FakeClaudeService(IClaudeService):
 
         Args:
             mock_responses: List of mock response messages to return.
+                          Plain strings are wrapped into messages with a
+                          .content attribute when yielded.
                           If None, returns empty responses.
         """
         self.mock_responses = mock_responses or []
@@ -132,8 +135,29 @@ class FakeClaudeService(IClaudeService):
         """
         # Yield the next response if available
         if self.response_index < len(self.mock_responses):
-            yield self.mock_responses[self.response_index]
-            self.response_index += 1
+            yield self._next_response()
+
+    async def collect(self) -> list:
+        """
+        Return the responses for the current query as a list.
+
+        Equivalent to draining receive_response(), without driving an
+        async generator for each message.
+
+        Returns:
+            List containing the next mock response, or an empty list
+        """
+        if self.response_index < len(self.mock_responses):
+            return [self._next_response()]
+        return []
+
+    def _next_response(self) -> Any:
+        """Return the next configured response, wrapping bare strings as messages."""
+        response = self.mock_responses[self.response_index]
+        self.response_index += 1
+        if isinstance(response, str):
+            return SimpleNamespace(content=response)
+        return response
 
     async def __aenter__(self):
         """No-op for fake service."""
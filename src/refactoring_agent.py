@@ -16,7 +16,7 @@ import os
 import sys
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Optional, Tuple, Dict, Any
+from typing import List, Optional, Sequence, Set, Tuple, Dict, Any, FrozenSet
 from rich.console import Console
 from rich.panel import Panel
 from rich.markdown import Markdown
@@ -27,7 +27,7 @@ from claude_service import IClaudeService, ClaudeServiceImpl
 from cli_tools import print_rich_message, parse_and_print_message
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class FunctionInfo:
     """Information about a function in the source file."""
     name: str
@@ -37,11 +37,11 @@ class FunctionInfo:
     is_static: bool
     is_class_method: bool
     has_env_access: bool
-    external_calls: List[str]
+    external_calls: Tuple[str, ...]
     body: str
 
 
-@dataclass
+@dataclass(slots=True)
 class ClassInfo:
     """Information about a class in the source file."""
     name: str
@@ -50,23 +50,23 @@ class ClassInfo:
     primary_function: Optional[str] = None
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class RefactoringAttempt:
     """Record of a refactoring attempt."""
     iteration: int
     target_function: str
     service_class_name: str
     success: bool
-    validation_errors: List[str]
-    changes_made: List[str]
+    validation_errors: Tuple[str, ...]
+    changes_made: Tuple[str, ...]
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class ValidationResult:
     """Result of validation hooks."""
     passed: bool
-    errors: List[str] = field(default_factory=list)
-    warnings: List[str] = field(default_factory=list)
+    errors: Tuple[str, ...] = field(default_factory=tuple)
+    warnings: Tuple[str, ...] = field(default_factory=tuple)
 
 
 class RefactoringAgent:
@@ -87,6 +87,7 @@ class RefactoringAgent:
         self.dry_run = dry_run
         self.console = Console()
         self.attempts: List[RefactoringAttempt] = []
+        self._ast_cache: Optional[Tuple[str, ast.Module]] = None
         self.current_source: str = ""
         self.original_source: str = ""
         self.file_path: str = ""
@@ -156,12 +157,29 @@ class RefactoringAgent:
             self.console.print(f"[red]Error during refactoring: {e}[/red]")
             return False
 
+    def _get_tree(self) -> ast.Module:
+        """
+        Parse current_source, reusing the last tree while the source is unchanged.
+
+        The cache is keyed on the source string itself, so reassigning
+        current_source invalidates it without any extra bookkeeping. Callers
+        must treat the returned tree as read-only. Raises SyntaxError like
+        ast.parse; failed parses are not cached.
+        """
+        source = self.current_source
+        cached = self._ast_cache
+        if cached is not None and cached[0] == source:
+            return cached[1]
+        tree = ast.parse(source)
+        self._ast_cache = (source, tree)
+        return tree
+
     def _analyze_source_structure(self) -> List[ClassInfo]:
         """Analyze the source file to extract class and function information."""
         classes = []
 
         try:
-            tree = ast.parse(self.current_source)
+            tree = self._get_tree()
         except SyntaxError as e:
             self.console.print(f"[red]Syntax error in source file: {e}[/red]")
             return []
@@ -176,6 +194,7 @@ class RefactoringAgent:
 
                 for item in node.body:
                     if isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                        has_env_access, external_calls = self._scan_function(item)
                         func_info = FunctionInfo(
                             name=item.name,
                             lineno=item.lineno,
@@ -185,8 +204,8 @@ class RefactoringAgent:
                                         for d in item.decorator_list),
                             is_class_method=any(isinstance(d, ast.Name) and d.id == "classmethod"
                                               for d in item.decorator_list),
-                            has_env_access=self._check_env_access(item),
-                            external_calls=self._find_external_calls(item),
+                            has_env_access=has_env_access,
+                            external_calls=tuple(sorted(external_calls)),
                             body=ast.unparse(item)
                         )
                         class_info.functions.append(func_info)
@@ -195,57 +214,63 @@ class RefactoringAgent:
 
         return classes
 
-    def _check_env_access(self, func_node) -> bool:
-        """Check if a function accesses environment variables."""
+    def _scan_function(self, func_node, env_only: bool = False) -> Tuple[bool, FrozenSet[str]]:
+        """
+        Collect environment access and external calls in a single ast.walk pass.
+
+        With env_only, external calls are not collected and the walk stops at
+        the first environment access.
+        """
+        has_env_access = False
+        external_calls: Set[str] = set()
+
         for node in ast.walk(func_node):
             # Check for os.environ access
             if isinstance(node, ast.Attribute):
                 if (isinstance(node.value, ast.Name) and
                     node.value.id == "os" and
                     node.attr == "environ"):
-                    return True
-
-            # Check for os.getenv calls
-            if isinstance(node, ast.Call):
-                if (isinstance(node.func, ast.Attribute) and
-                    isinstance(node.func.value, ast.Name) and
-                    node.func.value.id == "os" and
-                    node.func.attr in ["getenv", "getenvb"]):
-                    return True
+                    if env_only:
+                        return True, frozenset()
+                    has_env_access = True
+
+            elif isinstance(node, ast.Call):
+                func = node.func
+                if isinstance(func, ast.Attribute):
+                    if isinstance(func.value, ast.Name):
+                        # Check for os.getenv calls
+                        if func.value.id == "os" and func.attr in ("getenv", "getenvb"):
+                            if env_only:
+                                return True, frozenset()
+                            has_env_access = True
+                        # Check for requests library
+                        elif (not env_only and
+                              func.value.id == "requests" and
+                              func.attr in ("get", "post", "put", "delete", "patch")):
+                            external_calls.add(f"requests.{func.attr}")
+                        # Check for httpx and aiohttp
+                        elif not env_only and func.value.id in ("httpx", "aiohttp"):
+                            external_calls.add(f"{func.value.id}.{func.attr}")
+
+                    # Check for urllib
+                    if not env_only and getattr(func.value, "attr", None) == "urlopen":
+                        external_calls.add("urllib.urlopen")
 
                 # Check for dotenv usage
-                if (isinstance(node.func, ast.Name) and
-                    node.func.id in ["load_dotenv", "dotenv_values"]):
-                    return True
+                elif isinstance(func, ast.Name) and func.id in ("load_dotenv", "dotenv_values"):
+                    if env_only:
+                        return True, frozenset()
+                    has_env_access = True
 
-        return False
+        return has_env_access, frozenset(external_calls)
 
-    def _find_external_calls(self, func_node) -> List[str]:
-        """Find external API/HTTP calls in a function."""
-        external_calls = []
+    def _check_env_access(self, func_node) -> bool:
+        """Check if a function accesses environment variables."""
+        return self._scan_function(func_node, env_only=True)[0]
 
-        for node in ast.walk(func_node):
-            if isinstance(node, ast.Call):
-                # Check for requests library
-                if isinstance(node.func, ast.Attribute):
-                    if (isinstance(node.func.value, ast.Name) and
-                        node.func.value.id == "requests" and
-                        node.func.attr in ["get", "post", "put", "delete", "patch"]):
-                        external_calls.append(f"requests.{node.func.attr}")
-
-                # Check for httpx
-                if (isinstance(node.func, ast.Attribute) and
-                    isinstance(node.func.value, ast.Name) and
-                    node.func.value.id == "httpx"):
-                    external_calls.append(f"httpx.{node.func.attr}")
-
-                # Check for urllib
-                if (isinstance(node.func, ast.Attribute) and
-                    hasattr(node.func.value, "attr") and
-                    node.func.value.attr == "urlopen"):
-                    external_calls.append("urllib.urlopen")
-
-        return external_calls
+    def _find_external_calls(self, func_node) -> FrozenSet[str]:
+        """Find the distinct external API/HTTP calls made by a function."""
+        return self._scan_function(func_node)[1]
 
     async def _identify_primary_function(self, class_info: ClassInfo) -> str:
         """Use Claude to identify the primary function of a class."""
@@ -436,39 +461,34 @@ class RefactoringAgent:
 
     def _run_validation_hooks(self, func: FunctionInfo, service_class_name: str) -> ValidationResult:
         """Run validation hooks on the refactored code."""
-        result = ValidationResult(passed=True)
+        errors = []
 
         # Hook 1: Validate service class was created
         if not self._validate_service_class_created(service_class_name):
-            result.passed = False
-            result.errors.append(f"Service class {service_class_name} was not created")
+            errors.append(f"Service class {service_class_name} was not created")
 
         # Hook 2: Validate function was removed from original class
         if not self._validate_function_removed(func.name):
-            result.passed = False
-            result.errors.append(f"Function {func.name} was not removed from original class")
+            errors.append(f"Function {func.name} was not removed from original class")
 
         # Hook 3: Validate no environment variable access in service class
         if not self._validate_no_env_access(service_class_name):
-            result.passed = False
-            result.errors.append(f"Service class {service_class_name} accesses environment variables")
+            errors.append(f"Service class {service_class_name} accesses environment variables")
 
         # Hook 4: Validate external clients use interfaces
         if not self._validate_interface_usage(service_class_name):
-            result.passed = False
-            result.errors.append(f"Service class {service_class_name} uses concrete implementations instead of interfaces")
+            errors.append(f"Service class {service_class_name} uses concrete implementations instead of interfaces")
 
         # Hook 5: Validate syntax
         if not self._validate_syntax():
-            result.passed = False
-            result.errors.append("Refactored code has syntax errors")
+            errors.append("Refactored code has syntax errors")
 
-        return result
+        return ValidationResult(passed=not errors, errors=tuple(errors))
 
     def _validate_service_class_created(self, service_class_name: str) -> bool:
         """Validate that the service class was created."""
         try:
-            tree = ast.parse(self.current_source)
+            tree = self._get_tree()
             for node in ast.walk(tree):
                 if isinstance(node, ast.ClassDef) and node.name == service_class_name:
                     return True
@@ -478,8 +498,11 @@ class RefactoringAgent:
 
     def _validate_function_removed(self, func_name: str) -> bool:
         """Validate that the function was removed from the original class."""
+        # A name that never appears in the source cannot still be defined
+        if func_name not in self.current_source:
+            return True
         try:
-            tree = ast.parse(self.current_source)
+            tree = self._get_tree()
             classes = [node for node in ast.walk(tree) if isinstance(node, ast.ClassDef)]
 
             # Check if function still exists in original classes (not service classes)
@@ -497,8 +520,12 @@ class RefactoringAgent:
 
     def _validate_no_env_access(self, service_class_name: str) -> bool:
         """Validate that the service class doesn't access environment variables."""
+        # Every pattern _scan_function flags contains one of these substrings
+        source = self.current_source
+        if "getenv" not in source and "environ" not in source and "dotenv" not in source:
+            return True
         try:
-            tree = ast.parse(self.current_source)
+            tree = self._get_tree()
             for node in ast.walk(tree):
                 if isinstance(node, ast.ClassDef) and node.name == service_class_name:
                     for item in node.body:
@@ -512,7 +539,7 @@ class RefactoringAgent:
     def _validate_interface_usage(self, service_class_name: str) -> bool:
         """Validate that external clients use interfaces, not concrete implementations."""
         try:
-            tree = ast.parse(self.current_source)
+            tree = self._get_tree()
             for node in ast.walk(tree):
                 if isinstance(node, ast.ClassDef) and node.name == service_class_name:
                     # Check constructor for concrete HTTP client instantiation
@@ -539,7 +566,7 @@ class RefactoringAgent:
     def _validate_syntax(self) -> bool:
         """Validate that the refactored code has valid Python syntax."""
         try:
-            ast.parse(self.current_source)
+            self._get_tree()
             return True
         except SyntaxError:
             return False
@@ -549,7 +576,7 @@ class RefactoringAgent:
         func_name: str,
         service_class_name: str,
         success: bool,
-        errors: List[str]
+        errors: Sequence[str]
     ):
         """Record a refactoring attempt."""
         attempt = RefactoringAttempt(
@@ -557,8 +584,8 @@ class RefactoringAgent:
             target_function=func_name,
             service_class_name=service_class_name,
             success=success,
-            validation_errors=errors,
-            changes_made=[]
+            validation_errors=tuple(errors),
+            changes_made=()
         )
         self.attempts.append(attempt)
 
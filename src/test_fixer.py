@@ -41,14 +41,25 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# Failure lines in pytest output: structured FAILED summaries, or bare assertion
+# errors as a fallback. One alternation so the output is only scanned once.
+_FAILURE_RE = re.compile(
+    r"(?P<test>[\w/._]+::\w+) FAILED - (?P<error>.+?)(?:\n|$)"
+    r"|(?P<assertion>AssertionError: .+?)(?:\n|$)",
+    re.MULTILINE
+)
 
-@dataclass
+# File paths Claude reports as changed in its fix response
+_MODIFIED_FILE_RE = re.compile(r"(?:Modified|Updated|Fixed).*?([/\w._-]+\.py)", re.IGNORECASE)
+
+
+@dataclass(frozen=True, slots=True)
 class TestResult:
     """Represents the result of running tests."""
     passed: int
     failed: int
     total: int
-    failures: List[str]
+    failures: Tuple[str, ...]
     exit_code: int
     full_output: str
 
@@ -61,12 +72,12 @@ class TestResult:
         return self.failed > other.failed
 
 
-@dataclass
+@dataclass(slots=True)
 class FixAttempt:
     """Represents a single fix attempt."""
     iteration: int
     test_result: TestResult
-    fixes_applied: List[str]
+    fixes_applied: Tuple[str, ...]
 
 
 class TestFixer:
@@ -118,9 +129,9 @@ class TestFixer:
 
             output = result.stdout + result.stderr
 
-            # Parse pytest output
-            passed = len(re.findall(r"PASSED", output))
-            failed = len(re.findall(r"FAILED", output))
+            # Parse pytest output (plain substring counts, no match objects built)
+            passed = output.count("PASSED")
+            failed = output.count("FAILED")
             total = passed + failed
 
             # Extract failure details
@@ -137,12 +148,12 @@ class TestFixer:
 
         except subprocess.TimeoutExpired:
             self.console.print("[red]Tests timed out after 5 minutes[/red]")
-            return TestResult(0, 999, 999, ["Test suite timeout"], -1, "")
+            return TestResult(0, 999, 999, ("Test suite timeout",), -1, "")
         except FileNotFoundError:
             self.console.print("[red]pytest not found. Install with: pip install pytest[/red]")
             raise
 
-    def _extract_failures(self, output: str) -> List[str]:
+    def _extract_failures(self, output: str) -> Tuple[str, ...]:
         """
         Extract failure details from pytest output.
 
@@ -150,27 +161,20 @@ class TestFixer:
             output: Full pytest output
 
         Returns:
-            List of failure descriptions
+            Tuple of failure descriptions
         """
         failures = []
+        assertion_errors = []
 
-        # Look for FAILED test lines (format: test_file.py::test_name FAILED - error)
-        failed_pattern = r"([\w/._]+::\w+) FAILED - (.+?)(?:\n|$)"
-        matches = re.finditer(failed_pattern, output, re.MULTILINE)
-
-        for match in matches:
-            test_name = match.group(1)
-            error = match.group(2)
-            failures.append(f"{test_name}: {error}")
-
-        # If no structured failures found, look for assertion errors
-        if not failures:
-            assertion_pattern = r"(AssertionError: .+?)(?:\n|$)"
-            matches = re.finditer(assertion_pattern, output, re.MULTILINE)
-            for match in matches:
-                failures.append(match.group(1))
+        for match in _FAILURE_RE.finditer(output):
+            # FAILED test lines (format: test_file.py::test_name FAILED - error)
+            if match.group("test"):
+                failures.append(f"{match.group('test')}: {match.group('error')}")
+            else:
+                assertion_errors.append(match.group("assertion"))
 
-        return failures
+        # If no structured failures found, fall back to assertion errors
+        return tuple(failures or assertion_errors)
 
     async def analyze_failures_with_claude(self, test_result: TestResult) -> str:
         """
@@ -215,14 +219,14 @@ Format your response with clear sections for each fix."""
 
         self.console.print("[cyan]Analyzing failures with Claude...[/cyan]")
 
-        response_text = ""
+        response_parts = []
         await self.claude_service.query(prompt)
 
         async for message in self.claude_service.receive_response():
             if hasattr(message, 'content'):
-                response_text += str(message.content)
+                response_parts.append(str(message.content))
 
-        return response_text
+        return "".join(response_parts)
 
     def _build_history_context(self) -> str:
         """
@@ -234,17 +238,17 @@ Format your response with clear sections for each fix."""
         if not self.fix_history:
             return ""
 
-        context = "\n\n## Previous Fix Attempts:\n"
+        parts = ["\n\n## Previous Fix Attempts:\n"]
         for attempt in self.fix_history:
-            context += f"\n### Attempt {attempt.iteration}:\n"
-            context += f"- Files modified: {', '.join(attempt.fixes_applied) if attempt.fixes_applied else 'None'}\n"
-            context += f"- Result: {attempt.test_result.passed} passed, {attempt.test_result.failed} failed\n"
-            context += f"- Failures: {', '.join(attempt.test_result.failures[:3])}"
+            parts.append(f"\n### Attempt {attempt.iteration}:\n")
+            parts.append(f"- Files modified: {', '.join(attempt.fixes_applied) if attempt.fixes_applied else 'None'}\n")
+            parts.append(f"- Result: {attempt.test_result.passed} passed, {attempt.test_result.failed} failed\n")
+            parts.append(f"- Failures: {', '.join(attempt.test_result.failures[:3])}")
             if len(attempt.test_result.failures) > 3:
-                context += f" ... and {len(attempt.test_result.failures) - 3} more"
-            context += "\n"
+                parts.append(f" ... and {len(attempt.test_result.failures) - 3} more")
+            parts.append("\n")
 
-        return context
+        return "".join(parts)
 
     async def should_continue_fixing(self, current_result: TestResult) -> Tuple[bool, str]:
         """
@@ -291,12 +295,13 @@ Your decision:"""
 
         self.console.print("[cyan]Asking Claude if we should continue...[/cyan]")
 
-        response_text = ""
+        response_parts = []
         await self.claude_service.query(prompt)
 
         async for message in self.claude_service.receive_response():
             if hasattr(message, 'content'):
-                response_text += str(message.content)
+                response_parts.append(str(message.content))
+        response_text = "".join(response_parts)
 
         # Parse Claude's decision
         response_upper = response_text.upper()
@@ -338,9 +343,7 @@ After making changes, list the files you modified."""
             if hasattr(message, 'content'):
                 content = str(message.content)
                 # Look for file paths in the response
-                file_pattern = r"(?:Modified|Updated|Fixed).*?([/\w._-]+\.py)"
-                matches = re.finditer(file_pattern, content, re.IGNORECASE)
-                for match in matches:
+                for match in _MODIFIED_FILE_RE.finditer(content):
                     files_modified.append(match.group(1))
 
         return list(set(files_modified))  # Remove duplicates
@@ -444,7 +447,7 @@ identify root causes, and apply precise fixes to make tests pass."""
                     fixes = await self.apply_fixes(analysis)
 
                     # Record attempt
-                    attempt = FixAttempt(iteration, current_result, fixes)
+                    attempt = FixAttempt(iteration, current_result, tuple(fixes))
                     self.fix_history.append(attempt)
 
                     self.console.print(f"[yellow]Files modified: {', '.join(fixes) if fixes else 'None'}[/yellow]")
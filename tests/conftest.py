@@ -0,0 +1,91 @@
+"""
+Shared pytest fixtures for the test suite.
+"""
+
+import pytest
+import pytest_asyncio
+
+
+@pytest.fixture(scope="session")
+def session_fake_service():
+    """Create one FakeClaudeService for the whole test session.
+
+    Request ``live_fake_service`` instead; it enters this instance's context
+    once per module and resets it before each test.
+    """
+    # Imported here so modules that never use it skip the claude_agent_sdk import
+    from src.claude_service import FakeClaudeService
+
+    return FakeClaudeService()
+
+
+@pytest_asyncio.fixture(scope="module", loop_scope="module")
+async def entered_fake_service(session_fake_service):
+    """Enter the shared fake service's context once per test module."""
+    async with session_fake_service as service:
+        yield service
+
+
+@pytest.fixture
+def live_fake_service(entered_fake_service):
+    """Yield the entered fake service with its responses and queries reset.
+
+    Async tests using it must run on the module loop:
+    ``@pytest.mark.asyncio(loop_scope="module")``.
+    """
+    entered_fake_service.mock_responses = []
+    entered_fake_service.reset()
+    yield entered_fake_service
+
+
+@pytest.fixture(scope="session")
+def session_fixer(session_fake_service):
+    """Create one TestFixer for the whole test session.
+
+    Request ``fixer`` instead; it resets this instance before each test.
+    """
+    # Imported here so modules that never use the fixer skip load_dotenv()
+    from rich.console import Console
+    from src.test_fixer import TestFixer
+
+    return TestFixer(
+        claude_service=session_fake_service,
+        max_iterations=5,
+        console=Console(quiet=True)
+    )
+
+
+@pytest.fixture
+def fixer(session_fixer):
+    """Yield the shared TestFixer with its history and fake service reset."""
+    session_fixer.fix_history.clear()
+    session_fixer.claude_service.mock_responses = []
+    session_fixer.claude_service.reset()
+    yield session_fixer
+
+
+@pytest.fixture(scope="module")
+def shared_agent():
+    """Create one RefactoringAgent per test module.
+
+    Request ``agent`` instead; it resets this instance before each test.
+    """
+    from refactoring_agent import RefactoringAgent
+    from claude_service import FakeClaudeService
+
+    return RefactoringAgent(
+        claude_service=FakeClaudeService(mock_responses=[]),
+        model="sonnet",
+        max_iterations=5
+    )
+
+
+@pytest.fixture
+def agent(shared_agent):
+    """Yield the module's RefactoringAgent with its per-file state cleared."""
+    shared_agent.attempts = []
+    shared_agent.current_source = ""
+    shared_agent.original_source = ""
+    # Tests that reuse a source string would otherwise inherit its parse
+    shared_agent._ast_cache = None
+    yield shared_agent
@@ -7,23 +7,28 @@ actual API calls to Claude.
 
 import pytest
 import asyncio
-from unittest.mock import Mock, patch, MagicMock
+from unittest.mock import Mock, patch
 from src.code_review_agent import main
 from src.claude_service import FakeClaudeService
 
 
+@pytest.fixture
+def fake_service():
+    """Provide a fresh FakeClaudeService for each test."""
+    return FakeClaudeService()
+
+
 class TestMainFunction:
     """Test cases for the main() function."""
 
-    @pytest.mark.asyncio
-    async def test_main_with_fake_service_file_mode(self):
+    async def test_main_with_fake_service_file_mode(self, fake_service):
         """Test that main processes a file review request correctly."""
         # Arrange
         mock_response = Mock()
         mock_response.type = "text"
         mock_response.content = "Code review complete"
 
-        fake_service = FakeClaudeService(mock_responses=[mock_response])
+        fake_service.mock_responses = [mock_response]
 
         # Mock command line arguments
         with patch('sys.argv', ['code_review_agent.py', '--file', 'test_file.py', '--stats', 'false']):
@@ -38,12 +43,8 @@ class TestMainFunction:
                 assert "test_file.py" in queries[0]
                 assert "comprehensive code review" in queries[0]
 
-    @pytest.mark.asyncio
-    async def test_fake_service_records_multiple_queries(self):
+    async def test_fake_service_records_multiple_queries(self, fake_service):
         """Test that FakeClaudeService correctly records multiple queries."""
-        # Arrange
-        fake_service = FakeClaudeService(mock_responses=[])
-
         # Act
         async with fake_service as service:
             await service.query("First query")
@@ -58,34 +59,29 @@ class TestMainFunction:
         assert queries[2] == "Third query"
         assert fake_service.query_count == 3
 
-    @pytest.mark.asyncio
-    async def test_fake_service_yields_mock_responses(self):
+    async def test_fake_service_yields_mock_responses(self, fake_service):
         """Test that FakeClaudeService yields configured mock responses."""
         # Arrange
-        mock_responses = [
+        fake_service.mock_responses = [
             {"type": "text", "content": "Response 1"},
             {"type": "text", "content": "Response 2"},
             {"type": "text", "content": "Response 3"}
         ]
-        fake_service = FakeClaudeService(mock_responses=mock_responses)
 
         # Act
         responses = []
         async with fake_service as service:
             # Query 1
             await service.query("Test query 1")
-            async for response in service.receive_response():
-                responses.append(response)
+            responses.extend(await service.collect())
 
             # Query 2
             await service.query("Test query 2")
-            async for response in service.receive_response():
-                responses.append(response)
+            responses.extend(await service.collect())
 
             # Query 3
             await service.query("Test query 3")
-            async for response in service.receive_response():
-                responses.append(response)
+            responses.extend(await service.collect())
 
         # Assert
         assert len(responses) == 3
@@ -93,7 +89,23 @@ class TestMainFunction:
         assert responses[1]["content"] == "Response 2"
         assert responses[2]["content"] == "Response 3"
 
-    @pytest.mark.asyncio
+    async def test_fake_service_wraps_string_responses(self, fake_service):
+        """Test that plain string responses are yielded as messages with content."""
+        # Arrange
+        fake_service.mock_responses = ["Response 1", "Response 2"]
+
+        # Act
+        responses = []
+        async with fake_service as service:
+            await service.query("Test query 1")
+            async for response in service.receive_response():
+                responses.append(response)
+            await service.query("Test query 2")
+            responses.extend(await service.collect())
+
+        # Assert
+        assert [r.content for r in responses] == ["Response 1", "Response 2"]
+
     async def test_fake_service_reset(self):
         """Test that reset() clears the service state."""
         # Arrange
@@ -114,12 +126,8 @@ class TestMainFunction:
         assert fake_service.query_count == 0
         assert len(fake_service.get_queries()) == 0
 
-    @pytest.mark.asyncio
-    async def test_fake_service_empty_responses(self):
+    async def test_fake_service_empty_responses(self, fake_service):
         """Test FakeClaudeService with no mock responses configured."""
-        # Arrange
-        fake_service = FakeClaudeService()  # No responses
-
         # Act
         responses = []
         async with fake_service as service:
@@ -135,41 +143,31 @@ class TestMainFunction:
 class TestClaudeServiceIntegration:
     """Integration tests for the service pattern."""
 
-    @pytest.mark.asyncio
-    async def test_service_context_manager(self):
+    async def test_service_context_manager(self, fake_service):
         """Test that fake service works as a context manager."""
-        # Arrange
-        fake_service = FakeClaudeService()
-
         # Act & Assert
         async with fake_service as service:
             assert service is fake_service
             await service.query("Test")
             # No exception should be raised
 
-    @pytest.mark.asyncio
-    async def test_multiple_response_iterations(self):
+    async def test_multiple_response_iterations(self, fake_service):
         """Test that responses are yielded one per query."""
         # Arrange
-        mock_responses = [
+        fake_service.mock_responses = [
             {"id": 1, "content": "First"},
             {"id": 2, "content": "Second"}
         ]
-        fake_service = FakeClaudeService(mock_responses=mock_responses)
 
         # Act
         async with fake_service as service:
             # First query/response
             await service.query("Test 1")
-            first_iteration = []
-            async for response in service.receive_response():
-                first_iteration.append(response)
+            first_iteration = await service.collect()
 
             # Second query/response
             await service.query("Test 2")
-            second_iteration = []
-            async for response in service.receive_response():
-                second_iteration.append(response)
+            second_iteration = await service.collect()
 
         # Assert
         assert len(first_iteration) == 1
@@ -178,11 +176,8 @@ class TestClaudeServiceIntegration:
         assert second_iteration[0]["id"] == 2
 
 
-def test_fake_service_synchronous_methods():
+def test_fake_service_synchronous_methods(fake_service):
     """Test synchronous helper methods on FakeClaudeService."""
-    # Arrange
-    fake_service = FakeClaudeService()
-
     # Act - Run async code
     async def run_test():
         async with fake_service as service:
@@ -4,12 +4,9 @@ Tests for the RefactoringAgent class.
 
 import ast
 import pytest
-import tempfile
-from pathlib import Path
-from unittest.mock import Mock, patch, AsyncMock, MagicMock
-
-import sys
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from collections import namedtuple
+from functools import lru_cache
+from unittest.mock import patch
 
 from refactoring_agent import (
     RefactoringAgent,
@@ -21,6 +18,123 @@ from refactoring_agent import (
 from claude_service import FakeClaudeService
 
 
+# Minimal stand-in for a Claude message: the agent only reads .content
+Response = namedtuple("Response", ["content"])
+
+SRC_ENV_ENVIRON = """
+def test_func():
+    value = os.environ['KEY']
+    return value
+"""
+
+SRC_ENV_GETENV = """
+def test_func():
+    value = os.getenv('KEY')
+    return value
+"""
+
+SRC_NO_ENV = """
+def test_func(param):
+    return param * 2
+"""
+
+SRC_REQUESTS_CALLS = """
+def fetch_data():
+    response = requests.get('http://api.example.com')
+    data = requests.post('http://api.example.com', json={})
+    return response
+"""
+
+SRC_HTTPX_CALLS = """
+def fetch_data():
+    client = httpx.Client()
+    response = httpx.get('http://api.example.com')
+    return response
+"""
+
+SRC_NO_CALLS = """
+def calculate(x, y):
+    return x + y
+"""
+
+SRC_CALCULATOR = """
+class Calculator:
+    def __init__(self):
+        self.value = 0
+
+    def add(self, x):
+        self.value += x
+
+    def multiply(self, x):
+        self.value *= x
+
+    @staticmethod
+    def square(x):
+        return x * x
+"""
+
+SRC_EXTRACTED_SERVICE = """
+class TestService:
+    def __init__(self, config):
+        self.config = config
+
+    def execute(self):
+        return True
+
+class OriginalClass:
+    def __init__(self):
+        self.service = TestService(config={})
+
+    def test_func(self):
+        return self.service.execute()
+"""
+
+
+def _make_func(name: str, lineno: int = 10, **overrides) -> FunctionInfo:
+    """Build a plain-method FunctionInfo, overriding only the fields a test cares about."""
+    fields = dict(
+        col_offset=4,
+        is_constructor=False,
+        is_static=False,
+        is_class_method=False,
+        has_env_access=False,
+        external_calls=(),
+        body=""
+    )
+    fields.update(overrides)
+    return FunctionInfo(name=name, lineno=lineno, **fields)
+
+
+def _record_attempts_bulk(agent: RefactoringAgent, rows) -> None:
+    """Append (func_name, service_class_name, success, errors) rows as numbered attempts."""
+    start = len(agent.attempts) + 1
+    agent.attempts.extend(
+        RefactoringAttempt(
+            iteration=start + i,
+            target_function=func_name,
+            service_class_name=service_class_name,
+            success=success,
+            validation_errors=tuple(errors),
+            changes_made=()
+        )
+        for i, (func_name, service_class_name, success, errors) in enumerate(rows)
+    )
+
+
+@lru_cache(maxsize=None)
+def _cached_parse(source: str) -> ast.Module:
+    """Parse a snippet once per session. Callers must not mutate the tree."""
+    return ast.parse(source)
+
+
+@pytest.fixture(scope="module")
+def no_class_file(tmp_path_factory):
+    """Write a class-free source file once for the tests that need a real path."""
+    path = tmp_path_factory.mktemp("refactor") / "standalone.py"
+    path.write_text("def standalone_func(): return 42")
+    return str(path)
+
+
 class TestFunctionInfo:
     """Test the FunctionInfo dataclass."""
 
@@ -34,12 +148,12 @@ class TestFunctionInfo:
             is_static=False,
             is_class_method=False,
             has_env_access=False,
-            external_calls=["requests.get"],
+            external_calls=("requests.get",),
             body="def test_func(): pass"
         )
         assert func.name == "test_func"
         assert func.lineno == 10
-        assert func.external_calls == ["requests.get"]
+        assert func.external_calls == ("requests.get",)
         assert not func.is_constructor
 
 
@@ -48,17 +162,7 @@ class TestClassInfo:
 
     def test_class_info_creation(self):
         """Test creating a ClassInfo instance."""
-        func = FunctionInfo(
-            name="method",
-            lineno=15,
-            col_offset=4,
-            is_constructor=False,
-            is_static=False,
-            is_class_method=False,
-            has_env_access=False,
-            external_calls=[],
-            body="def method(): pass"
-        )
+        func = _make_func("method", 15, body="def method(): pass")
         cls = ClassInfo(
             name="TestClass",
             lineno=10,
@@ -83,8 +187,8 @@ class TestValidationResult:
         """Test a failing validation result."""
         result = ValidationResult(
             passed=False,
-            errors=["Error 1", "Error 2"],
-            warnings=["Warning 1"]
+            errors=("Error 1", "Error 2"),
+            warnings=("Warning 1",)
         )
         assert not result.passed
         assert len(result.errors) == 2
@@ -94,16 +198,6 @@ class TestValidationResult:
 class TestRefactoringAgent:
     """Test the RefactoringAgent class."""
 
-    @pytest.fixture
-    def agent(self):
-        """Create a RefactoringAgent instance for testing."""
-        fake_service = FakeClaudeService(mock_responses=[])
-        return RefactoringAgent(
-            claude_service=fake_service,
-            model="sonnet",
-            max_iterations=5
-        )
-
     def test_agent_initialization(self, agent):
         """Test agent initialization."""
         assert agent.model == "sonnet"
@@ -111,100 +205,64 @@ class TestRefactoringAgent:
         assert len(agent.attempts) == 0
         assert agent.current_source == ""
 
-    def test_check_env_access_with_os_environ(self, agent):
-        """Test detecting os.environ access."""
-        code = """
-def test_func():
-    value = os.environ['KEY']
-    return value
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
-        assert agent._check_env_access(func_node) is True
-
-    def test_check_env_access_with_os_getenv(self, agent):
-        """Test detecting os.getenv access."""
-        code = """
-def test_func():
-    value = os.getenv('KEY')
-    return value
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
-        assert agent._check_env_access(func_node) is True
-
-    def test_check_env_access_without_env(self, agent):
-        """Test function without environment access."""
-        code = """
-def test_func(param):
-    return param * 2
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
-        assert agent._check_env_access(func_node) is False
-
-    def test_find_external_calls_requests(self, agent):
-        """Test finding requests library calls."""
-        code = """
-def fetch_data():
-    response = requests.get('http://api.example.com')
-    data = requests.post('http://api.example.com', json={})
-    return response
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
-        calls = agent._find_external_calls(func_node)
-        assert "requests.get" in calls
-        assert "requests.post" in calls
-
-    def test_find_external_calls_httpx(self, agent):
-        """Test finding httpx library calls."""
-        code = """
-def fetch_data():
-    client = httpx.Client()
-    response = httpx.get('http://api.example.com')
-    return response
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
-        calls = agent._find_external_calls(func_node)
-        assert "httpx.get" in calls
-
-    def test_find_external_calls_none(self, agent):
-        """Test function without external calls."""
-        code = """
-def calculate(x, y):
-    return x + y
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
-        calls = agent._find_external_calls(func_node)
-        assert len(calls) == 0
+    @pytest.mark.parametrize("source,expected", [
+        (SRC_ENV_ENVIRON, True),
+        (SRC_ENV_GETENV, True),
+        (SRC_NO_ENV, False),
+    ], ids=["os_environ", "os_getenv", "no_env"])
+    def test_check_env_access(self, agent, source, expected):
+        """Test detecting environment variable access."""
+        func_node = _cached_parse(source).body[0]
+        assert agent._check_env_access(func_node) is expected
+
+    @pytest.mark.parametrize("source,expected", [
+        (SRC_REQUESTS_CALLS, {"requests.get", "requests.post"}),
+        (SRC_HTTPX_CALLS, {"httpx.Client", "httpx.get"}),
+        (SRC_NO_CALLS, set()),
+    ], ids=["requests", "httpx", "none"])
+    def test_find_external_calls(self, agent, source, expected):
+        """Test finding external HTTP library calls."""
+        func_node = _cached_parse(source).body[0]
+        assert agent._find_external_calls(func_node) == expected
+
+    def test_analyze_source_structure_sorts_external_calls(self, agent):
+        """Test that FunctionInfo stores external calls deduplicated and sorted."""
+        agent.current_source = (
+            "class Client:\n"
+            "    def sync(self):\n"
+            "        requests.post('u')\n"
+            "        requests.get('u')\n"
+            "        requests.get('v')\n"
+        )
+        classes = agent._analyze_source_structure()
+        assert classes[0].functions[0].external_calls == ("requests.get", "requests.post")
+
+    def test_scan_function_reports_env_and_calls(self, agent):
+        """Test the single-pass scan returns env access and external calls together."""
+        func_node = _cached_parse(
+            "def f():\n    key = os.getenv('KEY')\n    return requests.get(key)"
+        ).body[0]
+        has_env, calls = agent._scan_function(func_node)
+        assert has_env is True
+        assert calls == frozenset({"requests.get"})
+
+    def test_scan_function_env_only_stops_at_env_access(self, agent):
+        """Test env_only mode reports env access without collecting calls."""
+        func_node = _cached_parse(
+            "def f():\n    key = os.getenv('KEY')\n    return requests.get(key)"
+        ).body[0]
+        assert agent._scan_function(func_node, env_only=True) == (True, frozenset())
 
     def test_analyze_source_structure(self, agent):
         """Test analyzing Python source structure."""
-        agent.current_source = """
-class Calculator:
-    def __init__(self):
-        self.value = 0
-
-    def add(self, x):
-        self.value += x
-
-    def multiply(self, x):
-        self.value *= x
-
-    @staticmethod
-    def square(x):
-        return x * x
-"""
+        agent.current_source = SRC_CALCULATOR
         classes = agent._analyze_source_structure()
         assert len(classes) == 1
         assert classes[0].name == "Calculator"
         assert len(classes[0].functions) == 4
 
         # Check function details
-        func_names = [f.name for f in classes[0].functions]
+        func_names = {f.name for f in classes[0].functions}
         assert "__init__" in func_names
         assert "add" in func_names
         assert "multiply" in func_names
@@ -234,6 +292,19 @@ def test()
 """
         assert agent._validate_syntax() is False
 
+    def test_validation_hooks_share_one_parse(self, agent):
+        """Test that hooks reuse the parsed tree until current_source changes."""
+        agent.current_source = SRC_EXTRACTED_SERVICE
+        with patch("refactoring_agent.ast.parse", wraps=ast.parse) as parse:
+            agent._validate_service_class_created("TestService")
+            agent._validate_no_env_access("TestService")
+            agent._validate_syntax()
+            assert parse.call_count == 1
+
+            agent.current_source = SRC_CALCULATOR
+            agent._validate_syntax()
+            assert parse.call_count == 2
+
     def test_validate_service_class_created(self, agent):
         """Test validation of service class creation."""
         agent.current_source = """
@@ -277,6 +348,14 @@ class ConfigService:
 """
         assert agent._validate_no_env_access("ConfigService") is False
 
+    def test_validators_skip_parse_without_candidate_substrings(self, agent):
+        """Test that env and removal checks pass without parsing when the source cannot match."""
+        agent.current_source = SRC_CALCULATOR
+        with patch("refactoring_agent.ast.parse", wraps=ast.parse) as parse:
+            assert agent._validate_no_env_access("Calculator") is True
+            assert agent._validate_function_removed("divide") is True
+            parse.assert_not_called()
+
     def test_validate_interface_usage_passing(self, agent):
         """Test interface usage validation - passing case."""
         agent.current_source = """
@@ -322,10 +401,12 @@ class DataService:
     def test_get_failure_history(self, agent):
         """Test getting failure history for a function."""
         # Add some attempts
-        agent._record_attempt("func1", "Service1", True, [])
-        agent._record_attempt("func2", "Service2", False, ["Error 1"])
-        agent._record_attempt("func1", "Service1", False, ["Error 2"])
-        agent._record_attempt("func2", "Service2", False, ["Error 3"])
+        _record_attempts_bulk(agent, [
+            ("func1", "Service1", True, []),
+            ("func2", "Service2", False, ["Error 1"]),
+            ("func1", "Service1", False, ["Error 2"]),
+            ("func2", "Service2", False, ["Error 3"]),
+        ])
 
         # Get failure history
         failures = agent._get_failure_history("func2")
@@ -335,15 +416,11 @@ class DataService:
 
     def test_build_refactoring_prompt(self, agent):
         """Test building a refactoring prompt."""
-        func = FunctionInfo(
-            name="process_data",
-            lineno=20,
-            col_offset=4,
-            is_constructor=False,
-            is_static=False,
-            is_class_method=False,
+        func = _make_func(
+            "process_data",
+            20,
             has_env_access=True,
-            external_calls=["requests.get"],
+            external_calls=("requests.get",),
             body="def process_data(): pass"
         )
 
@@ -363,69 +440,38 @@ class DataService:
 
     def test_run_validation_hooks_all_passing(self, agent):
         """Test validation hooks when all pass."""
-        agent.current_source = """
-class TestService:
-    def __init__(self, config):
-        self.config = config
-
-    def execute(self):
-        return True
-
-class OriginalClass:
-    def __init__(self):
-        self.service = TestService(config={})
-
-    def test_func(self):
-        return self.service.execute()
-"""
-        func = FunctionInfo(
-            name="old_func",
-            lineno=10,
-            col_offset=4,
-            is_constructor=False,
-            is_static=False,
-            is_class_method=False,
-            has_env_access=False,
-            external_calls=[],
-            body=""
-        )
+        agent.current_source = SRC_EXTRACTED_SERVICE
+        func = _make_func("old_func")
 
         result = agent._run_validation_hooks(func, "TestService")
         assert result.passed is True
         assert len(result.errors) == 0
 
-    @pytest.mark.asyncio
-    async def test_identify_primary_function(self):
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_identify_primary_function(self, live_fake_service):
         """Test identifying the primary function of a class."""
-        # Create a mock response object with content attribute
-        mock_response = MagicMock()
-        mock_response.content = "process_data"
+        mock_response = Response(content="process_data")
 
-        fake_service = FakeClaudeService(
-            mock_responses=[mock_response]
-        )
-        agent = RefactoringAgent(claude_service=fake_service)
+        live_fake_service.mock_responses = [mock_response]
+        agent = RefactoringAgent(claude_service=live_fake_service)
 
         class_info = ClassInfo(
             name="DataProcessor",
             lineno=10,
             functions=[
-                FunctionInfo("__init__", 11, 4, True, False, False, False, [], ""),
-                FunctionInfo("process_data", 15, 4, False, False, False, False, [], ""),
-                FunctionInfo("helper", 20, 4, False, False, False, False, [], "")
+                _make_func("__init__", 11, is_constructor=True),
+                _make_func("process_data", 15),
+                _make_func("helper", 20)
             ]
         )
 
         agent.current_source = "class DataProcessor: pass"
 
-        # Need to use the service within its context manager
-        async with fake_service as service:
-            agent.claude_service = service
-            primary = await agent._identify_primary_function(class_info)
-            assert primary == "process_data"
+        primary = await agent._identify_primary_function(class_info)
+        assert primary == "process_data"
 
-    @pytest.mark.asyncio
-    async def test_execute_refactoring(self):
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_execute_refactoring(self, live_fake_service):
         """Test executing refactoring with Claude."""
         refactored_code = """class ProcessDataService:
     def __init__(self):
@@ -438,44 +484,30 @@ class DataProcessor:
     def __init__(self):
         self.service = ProcessDataService()"""
 
-        # Create a mock response object with content attribute
-        mock_response = MagicMock()
-        mock_response.content = f"```python\n{refactored_code}\n```"
+        mock_response = Response(content=f"```python\n{refactored_code}\n```")
 
-        fake_service = FakeClaudeService(
-            mock_responses=[mock_response]
-        )
-        agent = RefactoringAgent(claude_service=fake_service)
+        live_fake_service.mock_responses = [mock_response]
+        agent = RefactoringAgent(claude_service=live_fake_service)
 
-        # Need to use the service within its context manager
-        async with fake_service as service:
-            agent.claude_service = service
-            result = await agent._execute_refactoring("Test prompt")
-            assert result == refactored_code
+        result = await agent._execute_refactoring("Test prompt")
+        assert result == refactored_code
 
-    @pytest.mark.asyncio
     async def test_refactor_file_not_found(self):
         """Test refactoring a non-existent file."""
         agent = RefactoringAgent()
         success = await agent.refactor_file("/nonexistent/file.py")
         assert success is False
 
-    @pytest.mark.asyncio
-    async def test_refactor_file_no_classes(self):
+    @pytest.mark.slow
+    async def test_refactor_file_no_classes(self, no_class_file):
         """Test refactoring a file with no classes."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write("def standalone_func(): return 42")
-            temp_file = f.name
-
-        try:
-            agent = RefactoringAgent()
-            success = await agent.refactor_file(temp_file)
-            assert success is True  # No classes to refactor
-        finally:
-            Path(temp_file).unlink()
-
-    @pytest.mark.asyncio
-    async def test_extract_function_to_service_success(self):
+        agent = RefactoringAgent()
+        success = await agent.refactor_file(no_class_file)
+        assert success is True  # No classes to refactor
+
+    @pytest.mark.slow
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_extract_function_to_service_success(self, live_fake_service):
         """Test successful function extraction to service."""
         refactored_code = """
 class CalculateService:
@@ -492,14 +524,10 @@ class Calculator:
     def calculate(self, x, y):
         return self.calculate_service.execute(x, y)
 """
-        # Create a mock response object with content attribute
-        mock_response = MagicMock()
-        mock_response.content = f"```python\n{refactored_code}\n```"
+        mock_response = Response(content=f"```python\n{refactored_code}\n```")
 
-        fake_service = FakeClaudeService(
-            mock_responses=[mock_response]
-        )
-        agent = RefactoringAgent(claude_service=fake_service)
+        live_fake_service.mock_responses = [mock_response]
+        agent = RefactoringAgent(claude_service=live_fake_service)
         agent.original_source = "class Calculator: pass"
         agent.current_source = agent.original_source
 
@@ -508,45 +536,28 @@ class Calculator:
             lineno=1,
             functions=[]
         )
-        func = FunctionInfo(
-            name="calculate",
-            lineno=5,
-            col_offset=4,
-            is_constructor=False,
-            is_static=False,
-            is_class_method=False,
-            has_env_access=False,
-            external_calls=[],
-            body=""
-        )
+        func = _make_func("calculate", 5)
 
-        # Need to use the service within its context manager
-        async with fake_service as service:
-            agent.claude_service = service
-            success = await agent._extract_function_to_service(class_info, func)
-            assert success is True
-            assert len(agent.attempts) == 1
-            assert agent.attempts[0].success is True
+        success = await agent._extract_function_to_service(class_info, func)
+        assert success is True
+        assert len(agent.attempts) == 1
+        assert agent.attempts[0].success is True
 
-    @pytest.mark.asyncio
-    async def test_refactor_class_with_primary_function(self):
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_refactor_class_with_primary_function(self, live_fake_service):
         """Test refactoring a class with a primary function identified."""
-        # Create a mock response object with content attribute
-        mock_response = MagicMock()
-        mock_response.content = "main_logic"
+        mock_response = Response(content="main_logic")
 
-        fake_service = FakeClaudeService(
-            mock_responses=[mock_response]  # Primary function identification
-        )
-        agent = RefactoringAgent(claude_service=fake_service, max_iterations=1)
+        live_fake_service.mock_responses = [mock_response]  # Primary function identification
+        agent = RefactoringAgent(claude_service=live_fake_service, max_iterations=1)
 
         class_info = ClassInfo(
             name="MyClass",
             lineno=1,
             functions=[
-                FunctionInfo("__init__", 2, 4, True, False, False, False, [], ""),
-                FunctionInfo("main_logic", 5, 4, False, False, False, False, [], ""),
-                FunctionInfo("helper", 10, 4, False, False, False, False, [], "")
+                _make_func("__init__", 2, is_constructor=True),
+                _make_func("main_logic", 5),
+                _make_func("helper", 10)
             ]
         )
 
@@ -562,15 +573,12 @@ class MyClass:
         return "help"
 """
 
-        # Need to use the service within its context manager
-        async with fake_service as service:
-            agent.claude_service = service
-            with patch.object(agent, '_extract_function_to_service', return_value=True) as mock_extract:
-                await agent._refactor_class(class_info)
-                # Should only try to extract 'helper' (not constructor or primary)
-                assert mock_extract.called
-                extracted_func = mock_extract.call_args[0][1]
-                assert extracted_func.name == "helper"
+        with patch.object(agent, '_extract_function_to_service', return_value=True) as mock_extract:
+            await agent._refactor_class(class_info)
+            # Should only try to extract 'helper' (not constructor or primary)
+            assert mock_extract.called
+            extracted_func = mock_extract.call_args[0][1]
+            assert extracted_func.name == "helper"
 
 
 class TestRefactoringAttempt:
@@ -583,8 +591,8 @@ class TestRefactoringAttempt:
             target_function="test_func",
             service_class_name="TestService",
             success=False,
-            validation_errors=["Error 1", "Error 2"],
-            changes_made=["Change 1"]
+            validation_errors=("Error 1", "Error 2"),
+            changes_made=("Change 1",)
         )
         assert attempt.iteration == 1
         assert attempt.target_function == "test_func"
@@ -595,7 +603,6 @@ class TestRefactoringAttempt:
 class TestMainFunction:
     """Test the main function and CLI parsing."""
 
-    @pytest.mark.asyncio
     async def test_main_with_missing_file(self):
         """Test main function with missing file argument."""
         with patch('sys.argv', ['refactoring_agent.py']):
@@ -603,7 +610,6 @@ class TestMainFunction:
                 from refactoring_agent import main
                 await main()
 
-    @pytest.mark.asyncio
     async def test_main_with_nonexistent_file(self):
         """Test main function with non-existent file."""
         with patch('sys.argv', ['refactoring_agent.py', '/nonexistent.py']):
@@ -612,22 +618,15 @@ class TestMainFunction:
                 await main()
             assert exc_info.value.code == 1
 
-    @pytest.mark.asyncio
-    async def test_main_with_valid_file(self):
+    @pytest.mark.slow
+    async def test_main_with_valid_file(self, no_class_file):
         """Test main function with a valid file."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write("class Test: pass")
-            temp_file = f.name
-
-        try:
-            # Create a fake service for testing
-            fake_service = FakeClaudeService(mock_responses=[])
-
-            with patch('sys.argv', ['refactoring_agent.py', temp_file]):
-                with patch('refactoring_agent.RefactoringAgent.refactor_file', return_value=True):
-                    with patch('sys.exit') as mock_exit:
-                        from refactoring_agent import main
-                        await main(claude_service=fake_service)
-                        mock_exit.assert_called_once_with(0)
-        finally:
-            Path(temp_file).unlink()
\ No newline at end of file
+        # Create a fake service for testing
+        fake_service = FakeClaudeService(mock_responses=[])
+
+        with patch('sys.argv', ['refactoring_agent.py', no_class_file]):
+            with patch('refactoring_agent.RefactoringAgent.refactor_file', return_value=True):
+                with patch('sys.exit') as mock_exit:
+                    from refactoring_agent import main
+                    await main(claude_service=fake_service)
+                    mock_exit.assert_called_once_with(0)
\ No newline at end of file
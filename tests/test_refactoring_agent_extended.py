@@ -4,14 +4,9 @@ Extended tests for the RefactoringAgent class - covering critical missing scenar
 
 import ast
 import pytest
-import tempfile
 import os
-from pathlib import Path
-from unittest.mock import Mock, patch, AsyncMock, MagicMock
-from io import StringIO
-
-import sys
-sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+from unittest.mock import patch, mock_open
+from types import SimpleNamespace
 
 from refactoring_agent import (
     RefactoringAgent,
@@ -23,18 +18,9 @@ from refactoring_agent import (
 from claude_service import FakeClaudeService
 
 
-class TestMissingValidationHooks:
-    """Tests for validation hooks that were missing coverage."""
-
-    @pytest.fixture
-    def agent(self):
-        """Create a RefactoringAgent instance for testing."""
-        fake_service = FakeClaudeService(mock_responses=[])
-        return RefactoringAgent(claude_service=fake_service)
-
-    def test_validate_function_removed_completely(self, agent):
-        """Test that function is completely removed from original class."""
-        agent.current_source = """
+# Calculator variants for the function-removal validation test
+_REMOVAL_SOURCES = {
+    "removed": """
 class Calculator:
     def __init__(self):
         self.service = AddService()
@@ -44,12 +30,8 @@ class Calculator:
 class AddService:
     def add(self, a, b):
         return a + b
-"""
-        assert agent._validate_function_removed("add") is True
-
-    def test_validate_function_delegated(self, agent):
-        """Test that function properly delegates to service."""
-        agent.current_source = """
+""",
+    "delegated": """
 class Calculator:
     def __init__(self):
         self.add_service = AddService()
@@ -60,25 +42,18 @@ class Calculator:
 class AddService:
     def execute(self, a, b):
         return a + b
-"""
-        # Function exists but only delegates (single return statement)
-        assert agent._validate_function_removed("add") is True
-
-    def test_validate_function_not_removed(self, agent):
-        """Test detection when function still has implementation logic."""
-        agent.current_source = """
+""",
+    "not_removed": """
 class Calculator:
     def add(self, a, b):
         # Still has logic
         result = a + b
         print(f"Adding {a} + {b}")
         return result
-"""
-        assert agent._validate_function_removed("add") is False
+""",
+}
 
-    def test_validate_env_access_in_init(self, agent):
-        """Test environment access detection in constructor."""
-        agent.current_source = """
+SRC_ENV_IN_INIT = """
 import os
 
 class ConfigService:
@@ -89,11 +64,8 @@ class ConfigService:
     def get_config(self):
         return self.api_key
 """
-        assert agent._validate_no_env_access("ConfigService") is False
 
-    def test_validate_interface_http_client(self, agent):
-        """Test validation of HTTP client interface usage."""
-        agent.current_source = """
+SRC_HTTP_INTERFACE_SERVICE = """
 from abc import ABC, abstractmethod
 
 class HTTPClientInterface(ABC):
@@ -107,11 +79,8 @@ class DataService:
     def fetch(self, endpoint):
         return self.client.get(endpoint)
 """
-        assert agent._validate_interface_usage("DataService") is True
 
-    def test_validate_interface_database(self, agent):
-        """Test validation of database interface usage."""
-        agent.current_source = """
+SRC_CONCRETE_DB_SERVICE = """
 import psycopg2  # Bad: concrete implementation
 
 class DataService:
@@ -121,11 +90,42 @@ class DataService:
     def query(self, sql):
         return self.conn.execute(sql)
 """
-        assert agent._validate_interface_usage("DataService") is True  # Currently passes, needs improvement
 
-    def test_run_validation_hooks_multiple_failing(self, agent):
-        """Test validation with multiple failures."""
-        agent.current_source = """
+# Snippets for the read-only scanner tests, parsed once at import
+_COMPREHENSION_TREE = ast.parse("""
+def process():
+    import os
+    values = [os.getenv(key) for key in ['A', 'B', 'C']]
+    return values
+""")
+
+_LAMBDA_TREE = ast.parse("""
+def setup():
+    import os
+    get_var = lambda x: os.environ.get(x, 'default')
+    return get_var
+""")
+
+_AIOHTTP_TREE = ast.parse("""
+async def fetch():
+    import aiohttp
+    async with aiohttp.ClientSession() as session:
+        async with session.get('http://api.example.com') as response:
+            return await response.json()
+""")
+
+BAD_SERVICE_RESPONSE = """```python
+import os
+
+class Service1:
+    def __init__(self):
+        self.key = os.getenv('KEY')  # Always has env access
+
+    def execute(self):
+        return "bad"
+```"""
+
+SRC_BAD_SERVICE = """
 import os
 import requests
 
@@ -138,6 +138,40 @@ class BadService:
         # Function not removed
         return "still here"
 """
+
+
+class TestMissingValidationHooks:
+    """Tests for validation hooks that were missing coverage."""
+
+    @pytest.mark.parametrize("variant,expected", [
+        ("removed", True),
+        # Function exists but only delegates (single return statement)
+        ("delegated", True),
+        ("not_removed", False),
+    ])
+    def test_validate_function_removed(self, agent, variant, expected):
+        """Test removal validation for removed, delegating and still-implemented functions."""
+        agent.current_source = _REMOVAL_SOURCES[variant]
+        assert agent._validate_function_removed("add") is expected
+
+    def test_validate_env_access_in_init(self, agent):
+        """Test environment access detection in constructor."""
+        agent.current_source = SRC_ENV_IN_INIT
+        assert agent._validate_no_env_access("ConfigService") is False
+
+    def test_validate_interface_http_client(self, agent):
+        """Test validation of HTTP client interface usage."""
+        agent.current_source = SRC_HTTP_INTERFACE_SERVICE
+        assert agent._validate_interface_usage("DataService") is True
+
+    def test_validate_interface_database(self, agent):
+        """Test validation of database interface usage."""
+        agent.current_source = SRC_CONCRETE_DB_SERVICE
+        assert agent._validate_interface_usage("DataService") is True  # Currently passes, needs improvement
+
+    def test_run_validation_hooks_multiple_failing(self, agent):
+        """Test validation with multiple failures."""
+        agent.current_source = SRC_BAD_SERVICE
         func = FunctionInfo(
             name="original_function",
             lineno=10,
@@ -146,7 +180,7 @@ class BadService:
             is_static=False,
             is_class_method=False,
             has_env_access=False,
-            external_calls=[],
+            external_calls=(),
             body=""
         )
 
@@ -158,15 +192,13 @@ class BadService:
 class TestErrorHandlingAndRecovery:
     """Tests for error handling and recovery scenarios."""
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_extract_function_first_failure_then_success(self):
         """Test function extraction that fails first then succeeds on retry."""
         # First response has syntax error, second is valid
-        mock_response_bad = MagicMock()
-        mock_response_bad.content = "```python\nclass BadSyntax\n```"  # Missing colon
+        mock_response_bad = SimpleNamespace(content="```python\nclass BadSyntax\n```")  # Missing colon
 
-        mock_response_good = MagicMock()
-        mock_response_good.content = """```python
+        mock_response_good = SimpleNamespace(content="""```python
 class CalculateService:
     def __init__(self):
         pass
@@ -180,7 +212,7 @@ class Calculator:
 
     def calculate(self, x, y):
         return self.calculate_service.execute(x, y)
-```"""
+```""")
 
         fake_service = FakeClaudeService(
             mock_responses=[mock_response_bad, mock_response_good]
@@ -198,7 +230,7 @@ class Calculator:
             is_static=False,
             is_class_method=False,
             has_env_access=False,
-            external_calls=[],
+            external_calls=(),
             body="def calculate(self, x, y):\n        return x + y"
         )
 
@@ -216,24 +248,11 @@ class Calculator:
             if success:
                 assert agent.attempts[-1].success is True
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_extract_function_max_retries_exceeded(self):
         """Test that extraction stops after 3 failed attempts."""
-        # All responses have validation issues
-        bad_responses = []
-        for i in range(4):  # More than max retries
-            mock_response = MagicMock()
-            mock_response.content = f"""```python
-import os
-
-class Service{i}:
-    def __init__(self):
-        self.key = os.getenv('KEY')  # Always has env access
-
-    def execute(self):
-        return "bad"
-```"""
-            bad_responses.append(mock_response)
+        # One extraction call issues one query, so only one bad response is read
+        bad_responses = [SimpleNamespace(content=BAD_SERVICE_RESPONSE)]
 
         fake_service = FakeClaudeService(mock_responses=bad_responses)
         agent = RefactoringAgent(claude_service=fake_service, max_iterations=10)
@@ -249,7 +268,7 @@ class Service{i}:
             is_static=False,
             is_class_method=False,
             has_env_access=False,
-            external_calls=[],
+            external_calls=(),
             body=""
         )
 
@@ -258,14 +277,60 @@ class Service{i}:
 
             # Mock _get_failure_history to return 3 failures
             with patch.object(agent, '_get_failure_history', return_value=[
-                RefactoringAttempt(1, "test_func", "Service1", False, ["error"], []),
-                RefactoringAttempt(2, "test_func", "Service2", False, ["error"], []),
-                RefactoringAttempt(3, "test_func", "Service3", False, ["error"], []),
+                RefactoringAttempt(1, "test_func", "Service1", False, ("error",), ()),
+                RefactoringAttempt(2, "test_func", "Service2", False, ("error",), ()),
+                RefactoringAttempt(3, "test_func", "Service3", False, ("error",), ()),
             ]):
                 success = await agent._extract_function_to_service(class_info, func)
                 assert success is False  # Should fail after max retries
+                assert fake_service.response_index == len(bad_responses)
+
+    @pytest.mark.asyncio(loop_scope="module")
+    async def test_extract_function_unchanged_refactored_source_passes(self):
+        """Test that already-refactored code returned unchanged still validates."""
+        # Source read from disk ends in a newline; Claude's reply is stripped
+        refactored = (
+            "class AddService:\n"
+            "    def add(self, a, b):\n"
+            "        return a + b\n"
+            "\n"
+            "class Calculator:\n"
+            "    def __init__(self):\n"
+            "        self.service = AddService()\n"
+            "\n"
+            "    def add(self, a, b):\n"
+            "        return self.service.add(a, b)\n"
+        )
+        responses = [SimpleNamespace(content=f"```python\n{refactored}```")]
+
+        fake_service = FakeClaudeService(mock_responses=responses)
+        agent = RefactoringAgent(claude_service=fake_service)
+        agent.original_source = refactored
+        agent.current_source = agent.original_source
+
+        class_info = ClassInfo(name="Calculator", lineno=5, functions=[])
+        func = FunctionInfo(
+            name="add",
+            lineno=9,
+            col_offset=4,
+            is_constructor=False,
+            is_static=False,
+            is_class_method=False,
+            has_env_access=False,
+            external_calls=(),
+            body=""
+        )
+
+        async with fake_service as service:
+            agent.claude_service = service
+            with patch.object(agent, '_run_validation_hooks',
+                              wraps=agent._run_validation_hooks) as mock_hooks:
+                assert await agent._extract_function_to_service(class_info, func) is True
+
+            assert mock_hooks.call_count == 1
+            assert agent.attempts[-1].success is True
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_refactor_file_read_permission_error(self):
         """Test handling of file read permission errors."""
         agent = RefactoringAgent()
@@ -274,28 +339,22 @@ class Service{i}:
             success = await agent.refactor_file("/some/file.py")
             assert success is False
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_refactor_file_write_permission_error(self):
         """Test handling of file write permission errors."""
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write("class Test:\n    def method(self): pass")
-            temp_file = f.name
-
-        try:
-            fake_service = FakeClaudeService(mock_responses=[])
-            agent = RefactoringAgent(claude_service=fake_service)
-
-            # Mock write to fail
-            with patch('builtins.open', side_effect=[
-                open(temp_file, 'r'),  # First open for read succeeds
-                PermissionError("Cannot write")  # Second open for write fails
-            ]):
-                success = await agent.refactor_file(temp_file)
-                assert success is False
-        finally:
-            Path(temp_file).unlink()
+        fake_service = FakeClaudeService(mock_responses=[])
+        agent = RefactoringAgent(claude_service=fake_service)
+
+        # First open (read) serves the source, second open (write) fails
+        m = mock_open(read_data="class Test:\n    def method(self): pass")
+        m.side_effect = [m.return_value, PermissionError("Cannot write")]
+        with patch("refactoring_agent.open", m, create=True):
+            success = await agent.refactor_file("test.py")
 
-    @pytest.mark.asyncio
+        assert success is False
+        m.assert_called_with("test.py", 'w')
+
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_claude_service_timeout(self):
         """Test handling of Claude service timeout."""
         import asyncio
@@ -320,7 +379,7 @@ class Service{i}:
             name="TestClass",
             lineno=1,
             functions=[
-                FunctionInfo("method", 2, 4, False, False, False, False, [], "")
+                FunctionInfo("method", 2, 4, False, False, False, False, (), "")
             ]
         )
 
@@ -335,12 +394,6 @@ class Service{i}:
 class TestEdgeCases:
     """Tests for edge cases and unusual scenarios."""
 
-    @pytest.fixture
-    def agent(self):
-        """Create a RefactoringAgent instance for testing."""
-        fake_service = FakeClaudeService(mock_responses=[])
-        return RefactoringAgent(claude_service=fake_service)
-
     def test_analyze_empty_file(self, agent):
         """Test analyzing an empty Python file."""
         agent.current_source = ""
@@ -378,7 +431,7 @@ class Outer:
 """
         classes = agent._analyze_source_structure()
         # Should find all three classes
-        class_names = [c.name for c in classes]
+        class_names = {c.name for c in classes}
         assert "Outer" in class_names
         assert "Inner" in class_names
         assert "DeepNested" in class_names
@@ -403,7 +456,7 @@ class Person:
         assert len(classes) == 1
         assert classes[0].name == "Person"
         # Should find the methods but not the generated __init__
-        func_names = [f.name for f in classes[0].functions if not f.is_constructor]
+        func_names = {f.name for f in classes[0].functions if not f.is_constructor}
         assert "greet" in func_names
         assert "get_age_in_days" in func_names
 
@@ -429,7 +482,7 @@ class AsyncProcessor:
         classes = agent._analyze_source_structure()
         assert len(classes) == 1
         # Check that we found all methods (async methods are parsed as FunctionDef in AST)
-        func_names = [f.name for f in classes[0].functions]
+        func_names = {f.name for f in classes[0].functions}
         assert "__init__" in func_names
         assert "fetch_data" in func_names
         assert "_make_request" in func_names
@@ -438,43 +491,21 @@ class AsyncProcessor:
 
     def test_check_env_access_in_comprehension(self, agent):
         """Test environment access detection in comprehensions."""
-        code = """
-def process():
-    import os
-    values = [os.getenv(key) for key in ['A', 'B', 'C']]
-    return values
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
+        func_node = _COMPREHENSION_TREE.body[0]
         assert agent._check_env_access(func_node) is True
 
     def test_check_env_access_in_lambda(self, agent):
         """Test environment access detection in lambda functions."""
-        code = """
-def setup():
-    import os
-    get_var = lambda x: os.environ.get(x, 'default')
-    return get_var
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
+        func_node = _LAMBDA_TREE.body[0]
         assert agent._check_env_access(func_node) is True
 
     def test_find_external_calls_aiohttp(self, agent):
         """Test finding aiohttp async HTTP calls."""
-        code = """
-async def fetch():
-    import aiohttp
-    async with aiohttp.ClientSession() as session:
-        async with session.get('http://api.example.com') as response:
-            return await response.json()
-"""
-        tree = ast.parse(code)
-        func_node = tree.body[0]
+        func_node = _AIOHTTP_TREE.body[0]
         calls = agent._find_external_calls(func_node)
-        # Current implementation might not catch this, documenting expected behavior
-        # This test documents a limitation that could be improved
-        assert len(calls) >= 0  # May or may not detect aiohttp
+        # Calls on the session object are not traced back to aiohttp,
+        # but constructing the session is detected
+        assert calls == {"aiohttp.ClientSession"}
 
     def test_build_refactoring_prompt_static_method(self, agent):
         """Test building prompt for static method extraction."""
@@ -486,7 +517,7 @@ async def fetch():
             is_static=True,  # Static method
             is_class_method=False,
             has_env_access=False,
-            external_calls=[],
+            external_calls=(),
             body="@staticmethod\ndef calculate_tax(amount): return amount * 0.1"
         )
 
@@ -505,7 +536,7 @@ async def fetch():
 class TestIntegrationScenarios:
     """Integration tests for complete refactoring scenarios."""
 
-    @pytest.mark.asyncio
+    @pytest.mark.asyncio(loop_scope="module")
     async def test_e2e_simple_class_refactoring(self):
         """Test end-to-end refactoring of a simple class."""
         original_code = """class Calculator:
@@ -520,45 +551,35 @@ class TestIntegrationScenarios:
         return self.result
 """
 
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(original_code)
-            temp_file = f.name
-
-        try:
-            # Test that the refactoring process runs without errors
-            # We'll use a simple mock that doesn't actually refactor
-            mock_primary = MagicMock()
-            mock_primary.content = "get_result"
+        # Test that the refactoring process runs without errors
+        # We'll use a simple mock that doesn't actually refactor
+        mock_primary = SimpleNamespace(content="get_result")
 
-            # Create a simple mock that returns the original code
-            # This tests the flow without complex refactoring
-            mock_no_change = MagicMock()
-            mock_no_change.content = f"```python\n{original_code}\n```"
+        # Create a simple mock that returns the original code
+        # This tests the flow without complex refactoring
+        mock_no_change = SimpleNamespace(content=f"```python\n{original_code}\n```")
 
-            fake_service = FakeClaudeService(
-                mock_responses=[mock_primary, mock_no_change]
-            )
+        fake_service = FakeClaudeService(
+            mock_responses=[mock_primary, mock_no_change]
+        )
 
-            agent = RefactoringAgent(claude_service=fake_service, max_iterations=2)
+        agent = RefactoringAgent(claude_service=fake_service, max_iterations=2)
 
+        # Serve the source from memory; no file touches the disk
+        m = mock_open(read_data=original_code)
+        with patch("refactoring_agent.open", m, create=True):
             # The refactoring process should run (may fail due to validation)
             # The important thing is that it attempts to refactor
-            success = await agent.refactor_file(temp_file)
+            success = await agent.refactor_file("calculator.py")
 
-            # The file should still exist regardless of success
-            assert Path(temp_file).exists()
+        m.assert_any_call("calculator.py", 'r')
 
-            # Agent should have tried to identify primary function
-            assert len(fake_service.get_queries()) > 0
+        # Agent should have tried to identify primary function
+        assert len(fake_service.get_queries()) > 0
 
-            # If successful, file should be readable
-            if success:
-                with open(temp_file, 'r') as f:
-                    content = f.read()
-                    assert len(content) > 0
-
-        finally:
-            Path(temp_file).unlink()
+        # If successful, the refactored source should have been written back
+        if success:
+            m().write.assert_called_once_with(agent.current_source)
 
 
 class TestHelperFunctions:
@@ -570,7 +591,7 @@ class TestHelperFunctions:
         # Should not crash with empty attempts
         agent.print_summary()
 
-    def test_print_summary_with_attempts(self):
+    def test_print_summary_with_attempts(self, capsys):
         """Test printing summary with mixed results."""
         agent = RefactoringAgent()
 
@@ -581,22 +602,25 @@ class TestHelperFunctions:
                 target_function="func1",
                 service_class_name="Service1",
                 success=True,
-                validation_errors=[],
-                changes_made=["Created Service1"]
+                validation_errors=(),
+                changes_made=("Created Service1",)
             ),
             RefactoringAttempt(
                 iteration=2,
                 target_function="func2",
                 service_class_name="Service2",
                 success=False,
-                validation_errors=["Environment access detected"],
-                changes_made=[]
+                validation_errors=("Environment access detected",),
+                changes_made=()
             ),
         ]
 
         # Should print without errors
-        with patch('sys.stdout', new=StringIO()):
-            agent.print_summary()
+        agent.print_summary()
+
+        output = capsys.readouterr().out
+        assert "func1" in output
+        assert "func2" in output
 
 
 if __name__ == "__main__":